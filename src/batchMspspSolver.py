@@ -0,0 +1,90 @@
+from collections import namedtuple
+from multiprocessing import Pool
+from geneticMspspSolver import GeneticMspspSolver
+from mspsp import MspspInstance, COMMENT
+from gene import GraphGene
+from parallel import taskSeed, seedRandom
+from time import monotonic
+import re
+import traceback
+
+BatchResult = namedtuple(
+    'BatchResult',
+    ['index', 'solution', 'makespan', 'generations', 'solveTime', 'error'],
+    defaults=(None,)
+)
+SIZE = re.compile(r"\b(nActs|nResources)\s*=\s*(\d+)\s*;")
+
+_cacheDir = None
+
+def estimatedSize(instance):
+    if isinstance(instance, MspspInstance):
+        return instance.nActs * instance.nResources
+    try:
+        with open(instance) as f:
+            scalars = dict(SIZE.findall(COMMENT.sub("", f.read())))
+    except OSError:
+        return 0
+    return int(scalars.get("nActs", 0)) * int(scalars.get("nResources", 0))
+
+def initWorker(cacheDir):
+    global _cacheDir
+    _cacheDir = cacheDir
+
+def solveJob(job):
+    index, instance, Gene, timeout, parameters, seed = job
+    start = monotonic()
+    seedRandom(seed)
+    try:
+        with GeneticMspspSolver(instance, Gene, cacheDir=_cacheDir, **parameters) as solver:
+            solver.solve(timeout=None if timeout is None else timeout - (monotonic() - start))
+    except Exception:
+        return BatchResult(index, None, None, None, monotonic() - start, traceback.format_exc())
+    return BatchResult(
+        index,
+        solver.solution.toMspspSolution(),
+        -solver.population.bestRecordedMax,
+        len(solver.scores) - 1,
+        monotonic() - start
+    )
+
+class BatchMspspSolver:
+    """Solve many instances on one persistent process pool.
+
+    Instances are paths or MspspInstances. Jobs are submitted largest first by nActs*nResources so that the big
+    instances do not end up as stragglers. parameters are passed to every GeneticMspspSolver; since pool workers
+    cannot start pools of their own, the workers parameter is not supported.
+    """
+    def __init__(self, Gene=GraphGene, workers=None, cacheDir=None, **parameters):
+        self.Gene = Gene
+        self.parameters = parameters
+        self.pool = Pool(workers, initializer=initWorker, initargs=(cacheDir,))
+
+    def solveIter(self, instances, timeout=None):
+        """Yield a BatchResult for every instance as soon as it is solved; index refers to the position in instances.
+
+        An instance that fails to parse or solve yields a result whose solution is None and whose error holds the
+        formatted traceback, so the remaining instances keep streaming.
+
+        timeout is the wall-clock budget per instance in seconds, including parsing.
+        """
+        order = sorted(range(len(instances)), key=lambda i: estimatedSize(instances[i]), reverse=True)
+        yield from self.pool.imap_unordered(
+            solveJob,
+            [(i, instances[i], self.Gene, timeout, self.parameters, taskSeed()) for i in order]
+        )
+
+    def solve(self, instances, timeout=None):
+        return sorted(self.solveIter(instances, timeout), key=lambda result: result.index)
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,9 +1,14 @@
-from numpy.core.shape_base import stack
 from geneticMspspSolver import GeneticMspspSolver
+from mspsp import MspspInstance
 from gene import GraphGene
-import matplotlib.pyplot as plt
+from multiprocessing import Pool
 import numpy as np
+import argparse
+import json
 import os
+import random
+import subprocess
+import sys
 import time
 
 parameters = {
@@ -15,54 +20,141 @@ parameters = {
     'parentCount': 3
 }
 
-if __name__ == "__main__":
-    benchmark_instances_dir = os.path.join(os.path.dirname(__file__), "..\\benchmark_instances")
-    plot_dir = os.path.join(os.path.dirname(__file__), "..\\plots")
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def runJob(job):
+    file, seed, cacheDir = job
+    random.seed(seed)
+    np.random.seed(seed)
+    start = time.perf_counter()
+    instance = MspspInstance(file, cacheDir)
+    parsed = time.perf_counter()
+    solver = GeneticMspspSolver(instance,
+        GraphGene,
+        size = parameters['populationSize'],
+        activityMutationPropability = parameters['activityMutationPropability'],
+        resourceMutationPropability = parameters['resourceMutationPropability'],
+        ageBiasFactor=parameters['ageBiasFactor'],
+        parentalBiasFactor=parameters['parentalBiasFactor'],
+        parentCount=parameters['parentCount']
+    )
+    initialized = time.perf_counter()
+    solver.solve()
+    solved = time.perf_counter()
+    return {
+        'instance': os.path.basename(file),
+        'seed': seed,
+        'makespan': -solver.score,
+        'lowerBound': instance.lowerBound,
+        'valid': solver.solution.toMspspSolution().isValid(),
+        'generations': len(solver.scores) - 1,
+        'evaluations': solver.population.evaluations,
+        'evaluationsPerSecond': solver.population.evaluations / (solved - parsed),
+        'parseTime': parsed - start,
+        'initTime': initialized - parsed,
+        'solveTime': solved - initialized,
+        'totalTime': solved - start,
+        'averages': [float(x) for x in solver.averages]
+    }
+
+def loadResults(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
 
-    bestScores = []
-    averages = []
-    standardDeviations = []
-    bestTimes = []
-    averageTimes = []
+def summarize(results):
+    summary = {}
+    for row in results:
+        summary.setdefault(row['instance'], []).append(row)
+    return {
+        instance: {
+            'best': min(row['makespan'] for row in rows),
+            'average': np.average([row['makespan'] for row in rows]),
+            'std': np.std([row['makespan'] for row in rows]),
+            'time': np.average([row['solveTime'] for row in rows]),
+            'evaluationsPerSecond': np.average([row['evaluationsPerSecond'] for row in rows])
+        }
+        for instance, rows in sorted(summary.items())
+    }
 
-    if not os.path.exists(os.path.join(os.path.dirname(__file__), "..\\images")):
-        os.mkdir(os.path.join(os.path.dirname(__file__), "..\\images"))
+def compare(summary, baseline, makespanTolerance, timeTolerance):
+    regressions = []
+    for instance, current in summary.items():
+        if instance not in baseline:
+            continue
+        reference = baseline[instance]
+        if current['average'] > reference['average'] * (1 + makespanTolerance):
+            regressions.append(f"{instance}: average makespan {current['average']} > baseline {reference['average']}")
+        if current['time'] > reference['time'] * (1 + timeTolerance):
+            regressions.append(f"{instance}: solve time {current['time']:.3f}s > baseline {reference['time']:.3f}s")
+    return regressions
 
-    for file in os.listdir(benchmark_instances_dir)[:20]:
-        f = os.path.join(benchmark_instances_dir, file)
-        print(f"Solving {file}...")
-        start = time.time()
-        scores = []
-        times = []
-        for i in range(5):
-            start = time.time()
-            solver = GeneticMspspSolver(f,
-                GraphGene,
-                size = parameters['populationSize'],
-                activityMutationPropability = parameters['activityMutationPropability'],
-                resourceMutationPropability = parameters['resourceMutationPropability'],
-                ageBiasFactor=parameters['ageBiasFactor'],
-                parentalBiasFactor=parameters['parentalBiasFactor'],
-                parentCount=parameters['parentCount']
-            )
-            solver.solve()
-            t = time.time() - start
-            scores.append(solver.score)
-            times.append(t)
-            plt.plot(list(range(len(solver.scores))), solver.averages, label="run {number}".format(number = i))
-            print(f"Attempt {i}: {solver.score} in {t}")
+def importTime(module, repetitions=5):
+    """Best of several fresh-interpreter wall-clock times for importing module from src, in seconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return min(
+        float(subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout)
+        for i in range(repetitions)
+    )
+
+def plot(results, plotDir):
+    import matplotlib.pyplot as plt
+    os.makedirs(plotDir, exist_ok=True)
+    for instance in sorted({row['instance'] for row in results}):
+        for row in sorted(filter(lambda row: row['instance'] == instance, results), key=lambda row: row['seed']):
+            plt.plot(list(range(len(row['averages']))), row['averages'], label="run {number}".format(number = row['seed']))
         plt.xlabel('Generation')
         plt.ylabel('Score')
-        plt.savefig(os.path.join(os.path.dirname(__file__), f"..\\plots\\{file}.png"))
+        plt.savefig(os.path.join(plotDir, f"{instance}.png"))
         plt.clf()
-        print(f"""Best = {max(scores)} in {max(times, key=lambda e: scores[times.index(e)])}, Average = {sum(scores)/5} in {sum(times)/5}, Std = {np.std(scores)}""")
-        bestScores.append(max(scores))
-        bestTimes.append(max(times, key=lambda e: scores[times.index(e)]))
-        averages.append(sum(scores)/5)
-        averageTimes.append(sum(times)/5)
-        standardDeviations.append(np.std(scores))
-        bestTimes
-    print(f"Best Scores: {bestScores}")
-    print(f"Best Times: {bestTimes}")
-    print(f"Averages = {averages}")
-    print(f"Average Times = {averageTimes}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the genetic MSPSP solver.")
+    parser.add_argument("--instances", default=os.path.join(root, "benchmark_instances"))
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--results", default=os.path.join(root, "bench_results.jsonl"))
+    parser.add_argument("--baseline")
+    parser.add_argument("--makespan-tolerance", type=float, default=0.02)
+    parser.add_argument("--time-tolerance", type=float, default=0.1)
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--plot", action="store_true")
+    parser.add_argument("--import-budget", type=float, help="maximum import time of geneticMspspSolver in seconds")
+    args = parser.parse_args()
+
+    regressions = []
+    if args.import_budget is not None:
+        elapsed = importTime("geneticMspspSolver")
+        print(f"Importing geneticMspspSolver takes {elapsed:.3f}s (budget {args.import_budget:.3f}s)")
+        if elapsed > args.import_budget:
+            regressions.append(f"import time {elapsed:.3f}s > budget {args.import_budget:.3f}s")
+
+    results = loadResults(args.results)
+    done = {(row['instance'], row['seed']) for row in results}
+    jobs = [
+        (os.path.join(args.instances, file), seed, args.cache_dir)
+        for file in sorted(os.listdir(args.instances))[:args.count]
+        for seed in range(args.repetitions)
+        if (file, seed) not in done
+    ]
+    print(f"{len(done)} runs already recorded, {len(jobs)} to go")
+
+    with open(args.results, "a") as f, Pool(args.workers) as pool:
+        for row in pool.imap_unordered(runJob, jobs):
+            f.write(json.dumps(row) + "\n")
+            f.flush()
+            results.append(row)
+            print(f"{row['instance']} seed {row['seed']}: {row['makespan']} in {row['solveTime']:.3f}s ({row['evaluationsPerSecond']:.0f} evaluations/s)")
+
+    summary = summarize(results)
+    for instance, entry in summary.items():
+        print(f"{instance}: Best = {entry['best']}, Average = {entry['average']} in {entry['time']:.3f}s, Std = {entry['std']}")
+    if args.plot:
+        plot(results, os.path.join(root, "plots"))
+    if args.baseline:
+        regressions += compare(summary, summarize(loadResults(args.baseline)), args.makespan_tolerance, args.time_tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    sys.exit(1 if regressions else 0)
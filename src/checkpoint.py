@@ -0,0 +1,48 @@
+import numpy as np
+import os
+import random
+
+def packRandomState():
+    version, internal, gauss = random.getstate()
+    _, keys, position, hasGauss, cachedGaussian = np.random.get_state()
+    return {
+        'pythonRandomVersion': np.array(version),
+        'pythonRandomInternal': np.array(internal, dtype=np.int64),
+        'pythonRandomGauss': np.array(np.nan if gauss is None else gauss),
+        'numpyRandomKeys': keys,
+        'numpyRandomPosition': np.array(position),
+        'numpyRandomHasGauss': np.array(hasGauss),
+        'numpyRandomCachedGaussian': np.array(cachedGaussian)
+    }
+
+def unpackRandomState(state):
+    gauss = state['pythonRandomGauss'].item()
+    random.setstate((
+        state['pythonRandomVersion'].item(),
+        tuple(state['pythonRandomInternal'].tolist()),
+        None if np.isnan(gauss) else gauss
+    ))
+    np.random.set_state((
+        'MT19937',
+        state['numpyRandomKeys'],
+        state['numpyRandomPosition'].item(),
+        state['numpyRandomHasGauss'].item(),
+        state['numpyRandomCachedGaussian'].item()
+    ))
+
+def saveCheckpoint(path, state):
+    """Write a dict of arrays as an uncompressed .npz file.
+
+    The file is written next to path first and then renamed over it, so a run that gets killed
+    mid-write leaves the previous checkpoint intact.
+    """
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        np.savez(f, **state, **packRandomState())
+    os.replace(temporary, path)
+
+def loadCheckpoint(path):
+    with np.load(path) as data:
+        state = {key: data[key] for key in data.files}
+    unpackRandomState(state)
+    return state
@@ -0,0 +1,29 @@
+from collections import OrderedDict
+
+class FitnessCache:
+    def __init__(self, size=4096):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, gene):
+        key = gene.genotype()
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            gene.score = self.entries[key]
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def store(self, gene):
+        key = gene.genotype()
+        self.entries[key] = gene.score
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
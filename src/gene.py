@@ -1,18 +1,107 @@
 from functools import reduce
 from operator import mul
-from mspsp import MspspInstance, MspspSolution
+from mspsp import MspspInstance, MspspSolution, overlappingPairs, bits
 from abc import ABC, abstractmethod
 from typing import Sequence, Dict, Tuple
 from random import choice, choices, randint, sample
 import numpy as np
 from numpy.random import binomial, permutation
-from scipy.sparse import coo_matrix
-from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+from matching import ResourceMatcher
+
+def decodeSchedules(instance, orders, matchings, predPad=None):
+    if predPad is None:
+        predPad = instance.predPad
+    size = len(orders)
+    individuals = np.arange(size)
+    rows = individuals[:, None]
+    offsets = np.arange(instance.maxSlots)
+    dur = instance.durArray
+    start = np.zeros((size, instance.nActs), dtype='int64')
+    finish = np.zeros((size, instance.nActs + 1), dtype='int64')
+    resourceSchedule = np.zeros((size, instance.nResources + 1), dtype='int64')
+    for position in range(instance.nActs):
+        acts = orders[:, position]
+        valid = offsets < instance.slotCount[acts][:, None]
+        slots = np.where(valid, instance.slotPtr[acts][:, None] + offsets, 0)
+        resources = np.where(valid, matchings[rows, slots], instance.nResources)
+        start[individuals, acts] = np.maximum(
+            resourceSchedule[rows, resources].max(axis=1, initial=0),
+            finish[rows, predPad[acts]].max(axis=1, initial=0)
+        )
+        finish[individuals, acts] = start[individuals, acts] + dur[acts]
+        resourceSchedule[rows, resources] = finish[individuals, acts][:, None]
+        resourceSchedule[:, instance.nResources] = 0
+    return start
+
+def insertSchedules(instance, orders, matchings, predPad=None):
+    """Serial schedule generation that may start an activity in any idle gap of its resources.
+
+    Every resource keeps a list of idle gaps, initially a single gap that never ends. Starting at the
+    precedence-ready time, each resource proposes its earliest fit and the activity moves to the latest proposal
+    until all of them agree, so the cost depends on the number of gaps rather than on the length of the schedule.
+    """
+    if predPad is None:
+        predPad = instance.predPad
+    size = len(orders)
+    individuals = np.arange(size)
+    rows = individuals[:, None]
+    offsets = np.arange(instance.maxSlots)
+    dur = instance.durArray
+    capacity = int(np.bincount(instance.usefulResIdx, minlength=instance.nResources).max(initial=0)) + 1
+    gapStart = np.zeros((size, instance.nResources + 1, capacity), dtype='int64')
+    gapEnd = np.zeros((size, instance.nResources + 1, capacity), dtype='int64')
+    gapEnd[:, :, 0] = np.iinfo('int64').max
+    gaps = np.ones((size, instance.nResources + 1), dtype='int64')
+    start = np.zeros((size, instance.nActs), dtype='int64')
+    finish = np.zeros((size, instance.nActs + 1), dtype='int64')
+    for position in range(instance.nActs):
+        acts = orders[:, position]
+        valid = offsets < instance.slotCount[acts][:, None]
+        slots = np.where(valid, instance.slotPtr[acts][:, None] + offsets, 0)
+        resources = np.where(valid, matchings[rows, slots], instance.nResources)
+        begin = finish[rows, predPad[acts]].max(axis=1, initial=0)
+        used = int(gaps.max())
+        pending = individuals
+        while len(pending):
+            candidate = np.maximum(gapStart[pending[:, None], resources[pending], :used], begin[pending, None, None])
+            fits = candidate + dur[acts[pending], None, None] <= gapEnd[pending[:, None], resources[pending], :used]
+            proposal = np.where(fits, candidate, np.iinfo('int64').max).min(axis=2).max(axis=1)
+            moved = proposal > begin[pending]
+            pending = pending[moved]
+            begin[pending] = proposal[moved]
+        end = begin + dur[acts]
+        start[individuals, acts] = begin
+        finish[individuals, acts] = end
+        occupying, column = np.nonzero(valid)
+        res = resources[occupying, column]
+        b = begin[occupying]
+        e = end[occupying]
+        contains = (gapStart[occupying, res, :used] <= b[:, None]) & (e[:, None] <= gapEnd[occupying, res, :used])
+        assert contains.any(axis=1).all(), "scheduled activity does not fit into a gap of its resources"
+        gap = contains.argmax(axis=1)
+        left = gapStart[occupying, res, gap]
+        right = gapEnd[occupying, res, gap]
+        gapStart[occupying, res, gap] = np.where(left == b, e, left)
+        gapEnd[occupying, res, gap] = np.where(left == b, right, b)
+        split = np.flatnonzero((left < b) & (e < right))
+        occupying, res = occupying[split], res[split]
+        gapStart[occupying, res, gaps[occupying, res]] = e[split]
+        gapEnd[occupying, res, gaps[occupying, res]] = right[split]
+        gaps[occupying, res] += 1
+    return start
 
 class Gene(ABC):
+    __slots__ = ()
+    # Genes that implement justify(genes) set this to True.
+    supportsJustify = False
+
     @abstractmethod
     def updateScore(self):
         pass
+
+    def updateScores(genes):
+        for gene in genes:
+            gene.updateScore()
     
     @abstractmethod
     def recombine(parents):
@@ -34,14 +123,32 @@ class Gene(ABC):
     def random(instance):
         pass
 
+    @classmethod
+    def randomPopulation(Gene, transformedInstance, size):
+        return [Gene.random(transformedInstance) for i in range(size)]
+
     @abstractmethod
     def transform(instance):
         pass
 
+    @abstractmethod
+    def genotype(self):
+        pass
+
+    @abstractmethod
+    def pack(self):
+        pass
+
+    @abstractmethod
+    def unpack(transformedInstance, state):
+        pass
+
     def show(self):
         self.toMspspSolution().show() 
 
 class NaiveGene(Gene):
+    mutationFactor = 100
+
     def __init__(
             self, 
             instance : MspspInstance, 
@@ -56,43 +163,27 @@ class NaiveGene(Gene):
         self.overlapFactor = instance.maxt
         self.precedenceFactor = instance.maxt**2
         self.skillFactor = instance.maxt
-        self.updateScore()
+        self.age = 0
+        self.score = None
 
     def updateScore(self):
-        end = list(map(lambda x, y: x + y, self.start, self.instance.dur))
-        overlappingPenalty = 0
-        precedencePenalty = 0
-        skillPenalty = 0
-        for act1 in range(self.instance.nActs):
-            for act2 in range(0, act1):
-                if len(set(self.resources[act1]) & set(self.resources[act2])) != 0:
-                    overlappingPenalty += self.overlapFactor * max(
-                            min(
-                                end[act1] - self.start[act2],
-                                end[act2] - self.start[act1]
-                            ),
-                            0
-                        )
-                for prec in range(self.instance.nPrecs):
-                    if (
-                        end[act1] > self.start[act2] and
-                        self.instance.pred[prec] == act1 and
-                        self.instance.succ[prec] == act2
-                    ) or (
-                        end[act2] > self.start[act1] and 
-                        self.instance.pred[prec] == act2 and 
-                        self.instance.succ[prec] == act1
-                    ):
-                        precedencePenalty += self.precedenceFactor
-            for skill, count in enumerate(self.instance.sreq[act1]):
-                skillPenalty += self.skillFactor * max(
-                    0,
-                    count - len(list(filter(
-                        lambda r: self.contributedSkill[act1, r] == skill,
-                        self.resources[act1]
-                    )))
-                )
-        self.score = - max(end) - overlappingPenalty - precedencePenalty - skillPenalty
+        start = np.array(self.start, dtype='int64')
+        end = start + self.instance.durArray
+        overlappingPenalty = self.overlapFactor * sum(
+            max(min(end[act1] - start[act2], end[act2] - start[act1]), 0)
+            for act1, act2 in overlappingPairs(self.instance.nResources, self.resources, start, end)
+        )
+        pred = self.instance.predArray
+        succ = self.instance.succArray
+        precedencePenalty = self.precedenceFactor * int(np.count_nonzero(
+            (pred != succ) & (end[pred] > start[succ])
+        ))
+        contributed = np.zeros((self.instance.nActs, self.instance.nSkills), dtype='int64')
+        for act in range(self.instance.nActs):
+            for res in self.resources[act]:
+                contributed[act, self.contributedSkill[act, res]] += 1
+        skillPenalty = self.skillFactor * int(np.maximum(self.instance.sreqArray - contributed, 0).sum())
+        self.score = - int(end.max()) - overlappingPenalty - precedencePenalty - skillPenalty
 
     def recombine(parents):
         return reduce(lambda x, y: x * y, parents)
@@ -129,40 +220,34 @@ class NaiveGene(Gene):
                 contributedSkill[act, res] = choice([selfchoice, parentchoice])
         return NaiveGene(self.instance, start, resources, contributedSkill)
 
-    def mutate(self, activityMutationPropablity = 0.1, resourceMutationPropablity = 0.1):
+    def mutate(self, activityMutationPropability = 0.1, resourceMutationPropability = 0.1, rescore = True):
         for act in range(self.instance.nActs): 
-            if choices([0, 1], k = 1, weights=[1 - activityMutationPropablity, 10*activityMutationPropablity])[0]:
+            if choices([0, 1], k = 1, weights=[1 - activityMutationPropability, 10*activityMutationPropability])[0]:
                 self.start[act] = randint(0, self.instance.maxt)
-            if choices([0, 1], k = 1, weights=[1 - activityMutationPropablity, activityMutationPropablity])[0]:
+            if choices([0, 1], k = 1, weights=[1 - activityMutationPropability, activityMutationPropability])[0]:
                 self.start[act] =  choice([
                     max(self.start[act] - 1, 0), 
                     min(self.start[act] + 1, self.instance.maxt - self.instance.dur[act])
                 ])
             if self.resources[act]:
-                if choices([0, 1], k = 1, weights=[1 - resourceMutationPropablity/10, resourceMutationPropablity/10])[0]:
+                if choices([0, 1], k = 1, weights=[1 - resourceMutationPropability/10, resourceMutationPropability/10])[0]:
                     self.resources[act] = sample(
                         self.instance.USEFUL_RES[act],
                         sum(self.instance.sreq[act])
                     )
                     for res in self.resources[act]:
-                        self.contributedSkill[act, res] = choice(list(filter(
-                            lambda i: self.instance.mastery[res][i],
-                            range(self.instance.nSkills)
-                        )))
+                        self.contributedSkill[act, res] = choice(self.instance.skillsOf[res])
                 newRes = None
-                if choices([0, 1], k = 1, weights=[1 - resourceMutationPropablity, resourceMutationPropablity])[0]:
+                if choices([0, 1], k = 1, weights=[1 - resourceMutationPropability, resourceMutationPropability])[0]:
                     self.resources[act].remove(choice(self.resources[act]))
-                    newRes = choice(list(filter(
-                        lambda res: res not in self.resources[act],
-                        self.instance.USEFUL_RES[act]
-                    )))
+                    newRes = choice(bits(
+                        self.instance.usefulMask[act] & ~sum(1 << res for res in self.resources[act])
+                    ))
                     self.resources[act].append(newRes)
                 for res in self.resources[act]:
                     if res == newRes or randint(1, NaiveGene.mutationFactor) <= 20:
-                        self.contributedSkill[act, res] = choice(list(filter(
-                            lambda index: self.instance.mastery[res][index],
-                            range(self.instance.nSkills)
-                        )))
+                        self.contributedSkill[act, res] = choice(self.instance.skillsOf[res])
+        if rescore:
             self.updateScore()
         return self
 
@@ -179,6 +264,35 @@ class NaiveGene(Gene):
         result.updateScore()
         solution.instance, solution.start, solution.resources, solution.contributedSkill
 
+    def genotype(self):
+        return (
+            tuple(self.start),
+            tuple(tuple(resources) for resources in self.resources),
+            tuple(sorted(self.contributedSkill.items()))
+        )
+
+    def pack(self):
+        resources = np.full((self.instance.nActs, self.instance.maxSlots), -1, dtype='int64')
+        skills = np.full((self.instance.nActs, self.instance.maxSlots), -1, dtype='int64')
+        for act in range(self.instance.nActs):
+            for slot, res in enumerate(self.resources[act]):
+                resources[act, slot] = res
+                skills[act, slot] = self.contributedSkill[act, res]
+        return np.array(self.start, dtype='int64'), resources, skills, self.score, self.age
+
+    def unpack(instance, state):
+        start, resources, skills, score, age = state
+        actResources = [[int(res) for res in row if res >= 0] for row in resources]
+        contributedSkill = {
+            (act, int(res)): int(skill)
+            for act, (row, skillRow) in enumerate(zip(resources, skills))
+            for res, skill in zip(row, skillRow) if res >= 0
+        }
+        result = NaiveGene(instance, [int(t) for t in start], actResources, contributedSkill)
+        result.score = int(score)
+        result.age = int(age)
+        return result
+
     def toMspspSolution(self):
         return MspspSolution(self.instance, self.start, self.resources, self.contributedSkill)
 
@@ -190,85 +304,122 @@ class NaiveGene(Gene):
             start.append(randint(0, instance.maxt - instance.dur[act]))
             resources.append(sample(instance.USEFUL_RES[act], sum(instance.sreq[act])))
             for res in resources[act]:
-                contributedSkill[act, res] = choice(list(filter(
-                    lambda index: instance.mastery[res][index],
-                    range(instance.nSkills)
-                )))
-        return NaiveGene(instance, start, resources, contributedSkill)
+                contributedSkill[act, res] = choice(instance.skillsOf[res])
+        gene = NaiveGene(instance, start, resources, contributedSkill)
+        gene.updateScore()
+        return gene
 
     def transform(instance : MspspInstance):
         return instance
 
 class GraphGene(Gene):
+    __slots__ = (
+        'instance',
+        'activityOrder',
+        'matcher',
+        'matching',
+        'age',
+        'score'
+    )
+    supportsJustify = True
+
     def __init__(
             self,
             instance,
-            precedenceGraph,
             activityOrder,
-            resourceGraph,
+            matcher,
             matching     
         ):
         self.instance = instance
-        self.precedenceGraph = precedenceGraph
         self.activityOrder = activityOrder
-        self.resourceGraph = resourceGraph
+        self.matcher = matcher
         self.matching = matching
         self.age = 0
         self.score = None
 
+    def resourcesOf(self, act):
+        return self.matching[self.instance.slotPtr[act]:self.instance.slotPtr[act + 1]]
+
     def updateScore(self):
-        start = [0 for i in range(self.instance.nActs)]
-        resources = [[] for i in range(self.instance.nActs)]
-        resourceSchedule = [0 for i in range(self.instance.nResources)]
-        for act in self.activityOrder:
-            resources[act] = self.matching[act][1]
-            skill = 0
-            skillCount = 0
-            for res in self.matching[act][1]:
-                while skillCount == self.instance.sreq[act][skill]:
-                    skill += 1
-                    skillCount = 0
-                else:
-                    skillCount += 1
-            start[act] = max(
-                [resourceSchedule[i] for i in resources[act]] +
-                [start[p] + self.instance.dur[p] for i, p in enumerate(self.instance.pred) if self.instance.succ[i] == act] + 
-                [0]
-            )
-            for res in resources[act]:
-                resourceSchedule[res] = start[act] + self.instance.dur[act]
-        self.score = -start[self.instance.nActs - 1]
-    
-    def recombine(parents):
-        activityOrder = sorted(
-            range(parents[0].instance.nActs),
-            key = lambda act: sum([parent.activityOrder.index(act) for parent in parents])
+        GraphGene.updateScores([self])
+
+    def updateScores(genes):
+        if not genes:
+            return
+        instance = genes[0].instance
+        start = decodeSchedules(
+            instance,
+            np.stack([gene.activityOrder for gene in genes]),
+            np.stack([gene.matching for gene in genes])
         )
+        for gene, makespan in zip(genes, start[:, instance.nActs - 1].tolist()):
+            gene.score = -makespan
+
+    def justify(genes):
+        """Apply backward-forward justification to the genes and write the resulting orders back.
+
+        The backward pass schedules the activities in order of decreasing finish time against the reversed
+        precedence graph, the forward pass in order of increasing start time of that right-justified schedule. Both
+        passes may move activities into earlier gaps on their resources. The gene keeps the forward pass's order of
+        start times, which the regular decoder turns into a schedule that is at least as short.
+        """
+        if not genes:
+            return
+        instance = genes[0].instance
+        rows = np.arange(len(genes))[:, None]
+        orders = np.stack([gene.activityOrder for gene in genes])
+        matchings = np.stack([gene.matching for gene in genes])
+        finish = decodeSchedules(instance, orders, matchings) + instance.durArray
+        position = np.empty_like(orders)
+        position[rows, orders] = np.arange(instance.nActs)
+        orders = np.lexsort((-position, -finish)).astype('int32')
+        finish = insertSchedules(instance, orders, matchings, instance.succPad) + instance.durArray
+        position[rows, orders] = np.arange(instance.nActs)
+        orders = np.lexsort((-position, -finish)).astype('int32')
+        start = insertSchedules(instance, orders, matchings)
+        position[rows, orders] = np.arange(instance.nActs)
+        orders = np.lexsort((position, start)).astype('int32')
+        start = decodeSchedules(instance, orders, matchings)
+        for i, gene in enumerate(genes):
+            if gene.score is None or -start[i, instance.nActs - 1] > gene.score:
+                gene.activityOrder = orders[i].copy()
+                gene.score = -int(start[i, instance.nActs - 1])
+
+    def recombine(parents):
+        instance = parents[0].instance
+        activityOrder = np.argsort(
+            sum(np.argsort(parent.activityOrder) for parent in parents),
+            kind='stable'
+        ).astype('int32')
+        matchings = [parent.matching.tolist() for parent in parents]
+        slotPtr = instance.slotPtr.tolist()
         matching = []
-        for act in range(parents[0].instance.nActs):
-            targets = [parent.matching[act][1].copy() for parent in parents]
-            for i in permutation(parents[0].matching[act][0]):
+        for act in range(instance.nActs):
+            targets = [parentMatching[slotPtr[act]:slotPtr[act + 1]] for parentMatching in matchings]
+            slots = [{res: slot for slot, res in enumerate(target)} for target in targets]
+            for i in permutation(instance.slotCount[act]).tolist():
                 target1 = choice(targets)
-                for target2 in targets:
+                for target2, slotOf in zip(targets, slots):
                     if target1[i] != target2[i]:
                         j = i
-                        while target1[j] in target2:
-                            nextj = np.where(target2 == target1[j])[0][0]
-                            target2[j] = target1[j]
+                        while j is not None:
+                            res = target1[j]
+                            nextj = slotOf.get(res)
+                            if slotOf.get(target2[j]) == j:
+                                del slotOf[target2[j]]
+                            target2[j] = res
+                            slotOf[res] = j
                             j = nextj
-                        target2[j] = target1[j]
-            matching.append((np.array(parents[0].matching[act][0], dtype='int32'), np.array(targets[0], dtype='int32')))
-        return GraphGene(parents[0].instance, parents[0].precedenceGraph, activityOrder, parents[0].resourceGraph, matching)
+            matching += targets[0]
+        return GraphGene(instance, activityOrder, parents[0].matcher, np.array(matching, dtype='int32'))
 
-    def mutate(self, activityMutationPropability = 0.1, resourceMutationPropability = 0.1):
+    def mutate(self, activityMutationPropability = 0.1, resourceMutationPropability = 0.1, rescore = True):
         if choices([0, 1], k = 1, weights=[1 - activityMutationPropability, activityMutationPropability])[0]:
             start, end = self.randomMaxUnrelatedSection()
             length = randint(0, end - start)
             start = randint(start, end - length)
             end = start + length
             self.activityOrder[start:end + 1] = permutation(self.activityOrder[start:end + 1])
-            if not self.toMspspSolution().isValid():
-                pass
         if choices([0, 1], k = 1, weights=[1 - resourceMutationPropability, resourceMutationPropability])[0]:
             start, end = self.randomMaxUnrelatedSection()
             length = randint(0, end - start)
@@ -277,37 +428,37 @@ class GraphGene(Gene):
             order = permutation(range(start, end+1))
             weights = permutation(list(range(1, self.instance.nResources + 1)))
             for act in order:
-                self.resourceGraph[act].data = np.array([weights[self.resourceGraph[act].col[res]] for res in range(self.resourceGraph[act].nnz)])
-                self.matching[act] = min_weight_full_bipartite_matching(self.resourceGraph[act])
-                for res in self.resourceGraph[act].col:
+                resources = self.resourcesOf(act)
+                resources[:] = self.matcher.perturb(act, resources, weights=weights)
+                for res in resources:
                     weights[res] += randint(1, 2*self.instance.nResources)
-        self.updateScore()
+        if rescore:
+            self.updateScore()
         return self
 
     def randomMaxUnrelatedSection(self):
+        relatedMask = self.instance.relatedMask
+        activityOrder = self.activityOrder
         start = choice(range(self.instance.nActs))
         end = start
-        mostRecent = start
-        excluded = []
+        excluded = relatedMask[int(activityOrder[start])]
         openStart = (start != 0)
-        openEnd = (end != len(self.activityOrder) - 1)
+        openEnd = (end != len(activityOrder) - 1)
         while openStart or openEnd:
-            for i, act in enumerate(self.instance.succ):
-                    if act == self.activityOrder[mostRecent]:
-                        excluded.append(self.instance.pred[i])
-            for i, act in enumerate(self.instance.pred):
-                    if act == self.activityOrder[mostRecent]:
-                        excluded.append(self.instance.succ[i])
             if openStart and (not openEnd or choice([0,1])):
-                if self.activityOrder[start - 1] not in excluded:
+                act = int(activityOrder[start - 1])
+                if not excluded >> act & 1:
                     start -= 1
-                    mostRecent = start
+                    excluded |= relatedMask[act]
+                    openStart = (start != 0)
                 else:
                     openStart = False
             else:
-                if self.activityOrder[end + 1] not in excluded:
+                act = int(activityOrder[end + 1])
+                if not excluded >> act & 1:
                     end += 1
-                    mostRecent = end
+                    excluded |= relatedMask[act]
+                    openEnd = (end != len(activityOrder) - 1)
                 else:
                     openEnd = False
         return start, end
@@ -315,16 +466,30 @@ class GraphGene(Gene):
     def fromMspspSolution(solution : MspspSolution):
         pass
 
+    def genotype(self):
+        return self.activityOrder.tobytes(), self.matching.tobytes()
+
+    def pack(self):
+        return self.activityOrder, self.matching, self.score, self.age
+
+    def unpack(transformedInstance, state):
+        instance, matcher = transformedInstance
+        activityOrder, matching, score, age = state
+        result = GraphGene(instance, activityOrder, matcher, matching)
+        result.score = score
+        result.age = age
+        return result
+
     def toMspspSolution(self):
         start = [0 for i in range(self.instance.nActs)]
         resources = [[] for i in range(self.instance.nActs)]
         contributedSkill = {}
         resourceSchedule = [0 for i in range(self.instance.nResources)]
         for act in self.activityOrder:
-            resources[act] = self.matching[act][1]
+            resources[act] = self.resourcesOf(act)
             skill = 0
             skillCount = 0
-            for i, res in enumerate(self.matching[act][1]):
+            for i, res in enumerate(resources[act]):
                 while skillCount == self.instance.sreq[act][skill]:
                     skill += 1
                     skillCount = 0
@@ -333,7 +498,7 @@ class GraphGene(Gene):
                     contributedSkill[act, res] = skill
             start[act] = max(
                 [resourceSchedule[i] for i in resources[act]] +
-                [start[p] + self.instance.dur[p] for i, p in enumerate(self.instance.pred) if self.instance.succ[i] == act] + 
+                [start[p] + self.instance.dur[p] for p in self.instance.predecessors(act)] + 
                 [0]
             )
             for res in resources[act]:
@@ -342,61 +507,38 @@ class GraphGene(Gene):
 
 
     def random(transformedInstance):
-        instance, precedenceGraph, resourceGraph = transformedInstance
-        activityOrder = []
-        
-        blocked = list(precedenceGraph.col.copy())
-        remaining = list(range(0, instance.nActs))
-        while remaining:
-            next = choice(list(filter(
-                lambda act: (act not in activityOrder) and (act not in blocked),
-                remaining
-            )))
-            activityOrder.append(next)
-            remaining.remove(next)
-            for i in range(precedenceGraph.nnz):
-                if precedenceGraph.row[i] == next:
-                    blocked.remove(precedenceGraph.col[i])
-        matching = []
+        instance, matcher = transformedInstance
+        matching = np.empty(instance.slotPtr[-1], dtype='int32')
         for act in range(instance.nActs):
-            resourceGraph[act].data = permutation(list(range(1, resourceGraph[act].nnz + 1)))
-            matching.append(min_weight_full_bipartite_matching(resourceGraph[act]))
-        result = GraphGene(instance, precedenceGraph, activityOrder, resourceGraph, matching)
+            matching[instance.slotPtr[act]:instance.slotPtr[act + 1]] = matcher.random(act)
+        result = GraphGene(instance, GraphGene.randomOrder(instance), matcher, matching)
         result.updateScore()
         return result
 
+    def randomPopulation(transformedInstance, size):
+        instance, matcher = transformedInstance
+        result = [
+            GraphGene(instance, GraphGene.randomOrder(instance), matcher, matching)
+            for matching in matcher.randomBatch(size)
+        ]
+        GraphGene.updateScores(result)
+        return result
+
+    def randomOrder(instance):
+        """Sample a topological order by repeatedly picking a uniformly random activity whose predecessors are all placed."""
+        indegree = [len(preds) for preds in instance.predList]
+        ready = [act for act in range(instance.nActs) if not indegree[act]]
+        activityOrder = []
+        while ready:
+            i = randint(0, len(ready) - 1)
+            ready[i], ready[-1] = ready[-1], ready[i]
+            act = ready.pop()
+            activityOrder.append(act)
+            for succ in instance.succList[act]:
+                indegree[succ] -= 1
+                if not indegree[succ]:
+                    ready.append(succ)
+        return np.array(activityOrder, dtype='int32')
+
     def transform(instance):
-        precedenceGraph = coo_matrix(
-            (
-                np.ones(instance.nPrecs),
-                (
-                    np.array(instance.pred),
-                    np.array(instance.succ)
-                )
-            ),
-            shape = (instance.nPrecs, instance.nPrecs)
-        )
-        resourceGraph = []
-        
-        for act in range(instance.nActs):
-            i = 0
-            pred = []
-            succ = []
-            for skill, req in enumerate(instance.sreq[act]):
-                for j in range(req):
-                    for res in instance.USEFUL_RES[act]:
-                        if instance.mastery[res][skill]:
-                            pred.append(i)
-                            succ.append(res)
-                    i+=1
-            resourceGraph.append(coo_matrix(
-                (
-                    np.ones(len(pred)),
-                    (
-                        np.array(pred),
-                        np.array(succ)
-                    )
-                ),
-                shape = (i, instance.nResources)
-            ))
-        return instance, precedenceGraph, resourceGraph
+        return instance, ResourceMatcher(instance)
@@ -1,7 +1,10 @@
 from population import Population
-from mspsp import MspspInstance, exampleFile
+from mspsp import MspspInstance
 from gene import GraphGene
-from time import time
+from checkpoint import saveCheckpoint, loadCheckpoint
+import numpy as np
+import os
+from time import monotonic
 
 class GeneticMspspSolver:
     def __init__(
@@ -14,43 +17,142 @@ class GeneticMspspSolver:
         resourceMutationPropability=0.1,
         ageBiasFactor=1,
         parentalBiasFactor=1,
-        parentCount=2
+        parentCount=2,
+        justify=False,
+        workers=None,
+        cacheSize=4096,
+        cacheDir=None,
+        stats=None,
+        checkpoint=None,
+        checkpointInterval=10
     ):
+        state = loadCheckpoint(checkpoint) if checkpoint and os.path.exists(checkpoint) else None
+        self.instance = file if isinstance(file, MspspInstance) else MspspInstance(file, cacheDir)
         self.population = Population(
-            MspspInstance(file),
+            self.instance,
             Ge = Gene,
             size = size,
             activityMutationPropability = activityMutationPropability,
             resourceMutationPropability = resourceMutationPropability,
             ageBiasFactor=ageBiasFactor,
             parentalBiasFactor = parentalBiasFactor,
-            parentCount = parentCount
+            parentCount = parentCount,
+            justify = justify,
+            workers = workers,
+            cacheSize = cacheSize,
+            stats = stats,
+            state = state
         )
+        self.stats = stats
         self.maxStagnation = maxStagnation
-        self.scores = [self.population.max]
-        self.averages = [self.population.score]
+        self.checkpoint = checkpoint
+        self.checkpointInterval = checkpointInterval
+        self.scores = state['scores'].tolist() if state else [self.population.max]
+        self.averages = state['averages'].tolist() if state else [self.population.score]
         self.score = self.population.max
         self.solution = self.population.bestRecordedIndividual
 
 
-    def solve(self, timeout = None, debug = False):
-        if timeout:
-            start = time()
+    def solve(self, timeout = None, debug = False, callback = None, onImprovement = None):
+        for solution in self.solveIter(timeout, debug, callback):
+            if onImprovement:
+                onImprovement(solution)
+        return self.solution
+
+    def solveIter(self, timeout = None, debug = False, callback = None):
+        """Run the genetic algorithm and yield an MspspSolution every time the best recorded individual improves.
+
+        The first yield is the best individual of the initial population. timeout is a wall-clock budget in
+        seconds: no generation is started that is expected to finish after it runs out. The run also ends as soon
+        as the best makespan reaches the instance's lower bound.
+        """
+        if timeout is not None:
+            deadline = monotonic() + timeout
         if debug:
-            print(f"Generation 0: best = {self.population.max}, median = {self.population.median}, average = {self.population.score}")
-            i = 1
-        while True:
+            print(f"Generation 0: best = {self.population.max}, median = {self.population.median}, average = {self.population.score}, gap = {self.gap():.3f}")
+        best = self.population.bestRecordedMax
+        yield self.population.bestRecordedIndividual.toMspspSolution()
+        while not self.isOptimal():
+            if timeout is not None:
+                started = monotonic()
+                if started >= deadline:
+                    break
             self.population.age()
             self.scores.append(self.population.max)
             self.averages.append(self.population.score)
-            if timeout:
-                if start - time() > timeout:
+            self.score = self.population.max
+            self.solution = self.population.bestRecordedIndividual
+            if callback:
+                callback(len(self.scores) - 1, self)
+            if debug:
+                print(f"Generation {len(self.scores) - 1}: best = {self.population.max}, median = {self.population.median}, average = {self.population.score}, gap = {self.gap():.3f}")
+            if self.checkpoint and (len(self.scores) - 1) % self.checkpointInterval == 0:
+                self.saveCheckpoint()
+            if self.population.bestRecordedMax > best:
+                best = self.population.bestRecordedMax
+                yield self.solution.toMspspSolution()
+            if timeout is not None:
+                finished = monotonic()
+                if finished + (finished - started) > deadline:
                     break
             if self.population.stagnationPeriod > self.maxStagnation:
                 break
-            if debug:    
-                print(f"Generation {i}: best = {self.population.max}, median = {self.population.median}, average = {self.population.score}")
-                i += 1
-        self.score = self.population.max
-        self.solution = self.population.bestRecordedIndividual
-        return self.solution
+        if self.checkpoint:
+            self.saveCheckpoint()
+
+    def gap(self):
+        """Relative distance of the best recorded makespan to the instance's lower bound."""
+        return (-self.population.bestRecordedMax - self.instance.lowerBound) / max(self.instance.lowerBound, 1)
+
+    def isOptimal(self):
+        return -self.population.bestRecordedMax <= self.instance.lowerBound
+
+    def saveCheckpoint(self, path=None):
+        """Write the population, score history and random state so a later solver can resume with checkpoint=path."""
+        state = self.population.packState()
+        state['scores'] = np.array(self.scores)
+        state['averages'] = np.array(self.averages)
+        saveCheckpoint(path or self.checkpoint, state)
+
+    def close(self):
+        self.population.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    parser = argparse.ArgumentParser(description="Solve one MSPSP instance with the genetic solver.")
+    parser.add_argument("file")
+    parser.add_argument("--timeout", type=float)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--max-stagnation", type=int, default=20)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--justify", action="store_true", help="apply backward-forward justification to every child")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--show", action="store_true")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+    with GeneticMspspSolver(
+        args.file,
+        size=args.size,
+        maxStagnation=args.max_stagnation,
+        justify=args.justify,
+        workers=args.workers,
+        cacheDir=args.cache_dir,
+        checkpoint=args.checkpoint
+    ) as solver:
+        solution = solver.solve(timeout=args.timeout, debug=args.debug).toMspspSolution()
+    print(f"Makespan = {-solver.population.bestRecordedMax} after {len(solver.scores) - 1} generations, lower bound = {solver.instance.lowerBound}, gap = {solver.gap():.3f}, valid = {solution.isValid()}")
+    if args.show:
+        solution.show()
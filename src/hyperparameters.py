@@ -1,37 +1,34 @@
 from geneticMspspSolver import GeneticMspspSolver
 from gene import GraphGene
-from random import sample
+from multiprocessing import Process
+from random import Random
+import argparse
 import os
 import time
-import optuna
 
 sizemax = 512
 numberOfInstances = 4
 n_trials = 128
+generationStride = 1000
 
-benchmark_instances_dir = os.path.join(os.path.dirname(__file__), "..\\benchmark_instances")
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+benchmark_instances_dir = os.path.join(root, "benchmark_instances")
 
 class Objective(object):
-        def __init__(self, numberOfInstances = numberOfInstances, timeBias = 0.1):
-            self.benchFiles = sample(os.listdir(benchmark_instances_dir), k=numberOfInstances)
+        def __init__(self, numberOfInstances = numberOfInstances, timeBias = 0.1, seed = 0, cacheDir = None):
+            self.benchFiles = Random(seed).sample(sorted(os.listdir(benchmark_instances_dir)), k=numberOfInstances)
             self.timeBias = timeBias
-            nl = '\n'
-            print(
-                f"""
-                Selected instances:
-                {nl.join(self.benchFiles)}            
-                """
-            )
+            self.cacheDir = cacheDir
 
         def __call__(self, trial):
-            populationSize = trial.suggest_int("populationSize", 16, sizemax, 16)
+            populationSize = trial.suggest_int("populationSize", 16, sizemax, step=16)
             activityMutationPropability = trial.suggest_float("activityMutationPropability", 0, 1)
             resourceMutationPropability = trial.suggest_float("resourceMutationPropability", 0, 1)
             ageBiasFactor = trial.suggest_float("ageBiasFactor", 0, 10)
             parentalBiasFactor = trial.suggest_float("parentalBiasFactor", 0, 10)
             parentCount=trial.suggest_int("parentCount", 1, 10)
             score = 0
-            for file in self.benchFiles:
+            for index, file in enumerate(self.benchFiles):
                 f = os.path.join(benchmark_instances_dir, file)
                 start = time.time()
                 solver = GeneticMspspSolver(f,
@@ -41,24 +38,71 @@ class Objective(object):
                     resourceMutationPropability = resourceMutationPropability,
                     ageBiasFactor=ageBiasFactor,
                     parentalBiasFactor=parentalBiasFactor,
-                    parentCount=parentCount
+                    parentCount=parentCount,
+                    cacheDir=self.cacheDir
                 )
-                solver.solve()
+
+                def report(generation, solver):
+                    import optuna
+                    trial.report(
+                        score + solver.population.max - (time.time() - start)*self.timeBias,
+                        index*generationStride + min(generation, generationStride - 1)
+                    )
+                    if trial.should_prune():
+                        raise optuna.TrialPruned()
+
+                solver.solve(callback=report)
                 score += solver.score
                 score -= (time.time() - start)*self.timeBias
             return score
 
+def optimize(storage, studyName, trials, seed, cacheDir):
+    import optuna
+    study = optuna.load_study(study_name=studyName, storage=storage)
+    study.optimize(Objective(seed=seed, cacheDir=cacheDir), n_trials=trials)
+
 if __name__ == "__main__":
-    benchmark_instances_dir = os.path.join(os.path.dirname(__file__), "..\\benchmark_instances")
+    import optuna
+    parser = argparse.ArgumentParser(description="Tune the genetic MSPSP solver's hyperparameters with Optuna.")
+    parser.add_argument("--trials", type=int, default=n_trials)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--storage", default="sqlite:///" + os.path.join(root, "tuning.db"))
+    parser.add_argument("--study", default="mspsp_genetic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir")
+    args = parser.parse_args()
+
+    study = optuna.create_study(
+        study_name=args.study,
+        storage=args.storage,
+        direction="maximize",
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=8, n_warmup_steps=10),
+        load_if_exists=True
+    )
+    nl = '\n'
+    print(
+        f"""
+        Selected instances:
+        {nl.join(Objective(seed=args.seed).benchFiles)}
+        """
+    )
+    workers = [
+        Process(
+            target=optimize,
+            args=(args.storage, args.study, args.trials // args.workers + (i < args.trials % args.workers), args.seed, args.cache_dir)
+        )
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
 
-    # Execute an optimization by using an `Objective` instance.
-    study = optuna.create_study(direction="maximize")
-    study.optimize(Objective(), n_trials=n_trials)
-    if not os.path.exists(os.path.join(os.path.dirname(__file__), "..\\images")):
-        os.mkdir(os.path.join(os.path.dirname(__file__), "..\\images"))
+    if not os.path.exists(os.path.join(root, "images")):
+        os.mkdir(os.path.join(root, "images"))
     fig = optuna.visualization.plot_param_importances(study)
-    fig.write_image(os.path.join(os.path.dirname(__file__), "..\\images\\param_importances.png"))
+    fig.write_image(os.path.join(root, "images", "param_importances.png"))
     fig = optuna.visualization.plot_parallel_coordinate(study)
-    fig.write_image(os.path.join(os.path.dirname(__file__), "..\\images\\parallel_coordinate.png"))
+    fig.write_image(os.path.join(root, "images", "parallel_coordinate.png"))
     fig = optuna.visualization.plot_slice(study)
-    fig.write_image(os.path.join(os.path.dirname(__file__), "..\\images\\sclices.png"))
+    fig.write_image(os.path.join(root, "images", "sclices.png"))
@@ -0,0 +1,101 @@
+from multiprocessing import Pipe, Process
+from population import Population
+from mspsp import MspspInstance
+from gene import GraphGene
+from parallel import taskSeed, seedRandom
+import numpy as np
+
+def runIsland(connection, file, cacheDir, Gene, parameters, migrationInterval, migrantCount, maxStagnation, seed):
+    seedRandom(seed)
+    population = Population(MspspInstance(file, cacheDir), Ge=Gene, **parameters)
+    while True:
+        scores = []
+        averages = []
+        for i in range(migrationInterval):
+            population.age()
+            scores.append(population.max)
+            averages.append(population.score)
+        connection.send((
+            [individual.pack() for individual in population.emigrants(migrantCount)],
+            population.stagnationPeriod > maxStagnation,
+            scores,
+            averages
+        ))
+        migrants = connection.recv()
+        if migrants is None:
+            break
+        population.immigrate([Gene.unpack(population.transformedInstance, state) for state in migrants])
+    connection.send(population.bestRecordedIndividual.pack())
+    connection.close()
+
+class IslandMspspSolver:
+    def __init__(
+        self,
+        file,
+        Gene=GraphGene,
+        islands=4,
+        migrationInterval=5,
+        migrantCount=2,
+        maxStagnation=20,
+        cacheDir=None,
+        **parameters
+    ):
+        if isinstance(islands, int):
+            islands = [{} for i in range(islands)]
+        self.file = file
+        self.cacheDir = cacheDir
+        self.Gene = Gene
+        self.islandParameters = [{**parameters, **overrides} for overrides in islands]
+        self.migrationInterval = migrationInterval
+        self.migrantCount = migrantCount
+        self.maxStagnation = maxStagnation
+        self.transformedInstance = Gene.transform(MspspInstance(file, cacheDir))
+        self.scores = []
+        self.averages = []
+        self.score = None
+        self.solution = None
+
+    def solve(self, debug = False):
+        connections = []
+        processes = []
+        for parameters in self.islandParameters:
+            connection, islandConnection = Pipe()
+            process = Process(
+                target=runIsland,
+                args=(
+                    islandConnection,
+                    self.file,
+                    self.cacheDir,
+                    self.Gene,
+                    parameters,
+                    self.migrationInterval,
+                    self.migrantCount,
+                    self.maxStagnation,
+                    taskSeed()
+                ),
+                daemon=True
+            )
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+        while True:
+            reports = [connection.recv() for connection in connections]
+            emigrants = [report[0] for report in reports]
+            for generation in zip(*[report[2] for report in reports]):
+                self.scores.append(max(generation))
+            for generation in zip(*[report[3] for report in reports]):
+                self.averages.append(np.average(generation))
+            if debug:
+                print(f"Generation {len(self.scores)}: best = {self.scores[-1]}, average = {self.averages[-1]}")
+            if all(report[1] for report in reports):
+                break
+            for i, connection in enumerate(connections):
+                connection.send(emigrants[i - 1])
+        for connection in connections:
+            connection.send(None)
+        best = [self.Gene.unpack(self.transformedInstance, connection.recv()) for connection in connections]
+        for process in processes:
+            process.join()
+        self.solution = max(best, key=lambda x: x.score)
+        self.score = self.solution.score
+        return self.solution
@@ -0,0 +1,71 @@
+from random import randint, sample, shuffle
+import numpy as np
+
+class ResourceMatcher:
+    def __init__(self, instance):
+        self.instance = instance
+        self.candidates = instance.slotCandidates
+
+    def random(self, act):
+        slots = self.instance.slotCount[act]
+        return self.repair(act, np.full(slots, -1, dtype='int32'), list(range(slots)))
+
+    def randomBatch(self, count):
+        """Random matchings of every activity for count genes at once, shape (count, total slots).
+
+        Each slot greedily takes its free candidate with the highest random priority, vectorized over the genes.
+        The rare rows where the greedy pass gets stuck are redrawn with random().
+        """
+        instance = self.instance
+        matchings = np.empty((count, instance.slotPtr[-1]), dtype='int32')
+        rows = np.arange(count)
+        for act in range(instance.nActs):
+            priority = np.random.random((count, instance.nResources))
+            taken = np.zeros((count, instance.nResources), dtype=bool)
+            stuck = np.zeros(count, dtype=bool)
+            for slot in range(instance.slotPtr[act], instance.slotPtr[act + 1]):
+                candidates = instance.slotCandidateIdx[instance.slotCandidatePtr[slot]:instance.slotCandidatePtr[slot + 1]]
+                if not len(candidates):
+                    raise ValueError(f"no full matching exists for activity {act}")
+                scores = np.where(taken[:, candidates], -1, priority[:, candidates])
+                best = scores.argmax(axis=1)
+                stuck |= scores[rows, best] < 0
+                matchings[:, slot] = candidates[best]
+                taken[rows, candidates[best]] = True
+            for row in np.flatnonzero(stuck):
+                matchings[row, instance.slotPtr[act]:instance.slotPtr[act + 1]] = self.random(act)
+        return matchings
+
+    def perturb(self, act, assignment, count=None, weights=None):
+        slots = len(assignment)
+        if count is None:
+            count = randint(1, slots) if slots else 0
+        return self.repair(act, assignment.copy(), sample(range(slots), count), weights)
+
+    def repair(self, act, assignment, free, weights=None):
+        offset = self.instance.slotPtr[act]
+        owner = {res: slot for slot, res in enumerate(assignment) if res >= 0}
+        for slot in free:
+            if assignment[slot] >= 0:
+                del owner[assignment[slot]]
+                assignment[slot] = -1
+        shuffle(free)
+        for slot in free:
+            if not self.augment(offset, slot, assignment, owner, set(), weights):
+                raise ValueError(f"no full matching exists for activity {act}")
+        return assignment
+
+    def augment(self, offset, slot, assignment, owner, visited, weights):
+        candidates = self.candidates[offset + slot].copy()
+        shuffle(candidates)
+        if weights is not None:
+            candidates.sort(key=lambda res: weights[res])
+        for res in candidates:
+            if res in visited:
+                continue
+            visited.add(res)
+            if res not in owner or self.augment(offset, owner[res], assignment, owner, visited, weights):
+                owner[res] = slot
+                assignment[slot] = res
+                return True
+        return False
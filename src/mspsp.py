@@ -1,47 +1,206 @@
+from collections import namedtuple
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+from heapq import heappush, heappop
+from functools import reduce
+from operator import or_
+import numpy as np
+
+
+PARSER_VERSION = 2
+SCALARS = ["nActs", "nSkills", "nResources", "nPrecs", "mint", "maxt", "nUnrels"]
+VECTORS = ["dur", "pred", "succ", "unpred", "unsucc"]
+MATRICES = ["sreq", "mastery"]
+SETS = {"USEFUL_RES": "usefulRes", "POTENTIAL_ACT": "potentialAct"}
+COMMENT = re.compile(r"%[^\n]*")
+ENTRY = re.compile(r"(\w+)\s*=\s*([^;]*);")
+SEPARATORS = str.maketrans("[]{}|,\n\t\r", " " * 9)
+
+def literals(value, dtype='int32'):
+    value = value.replace("true", "1").replace("false", "0").translate(SEPARATORS)
+    return np.fromstring(value, dtype=dtype, sep=" ")
+
+def parseDzn(text):
+    arrays = {}
+    for name, value in ENTRY.findall(COMMENT.sub("", text)):
+        if name in SCALARS:
+            arrays[name] = np.array(int(value), dtype='int64')
+        elif name in VECTORS:
+            arrays[name] = literals(value) - (0 if name == "dur" else 1)
+        elif name in MATRICES:
+            arrays[name] = literals(value).reshape(max(value.count("|") - 1, 1), -1)
+            if name == "mastery":
+                arrays[name] = arrays[name].astype(bool)
+        elif name in SETS:
+            ptr = np.zeros(value.count("{") + 1, dtype='int32')
+            np.cumsum([
+                entry.count(",") + 1 if entry.strip() else 0
+                for entry in (chunk.split("}")[0] for chunk in value.split("{")[1:])
+            ], out=ptr[1:])
+            arrays[SETS[name] + "Ptr"] = ptr
+            arrays[SETS[name] + "Idx"] = literals(value) - 1
+    return arrays
+
+def bits(mask):
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+def loadInstanceArrays(filepath, cacheDir=None):
+    """Parse a dzn file, reusing the pickled arrays in cacheDir when they exist; return (contentHash, arrays).
+
+    Entries are keyed by the file contents and PARSER_VERSION, which has to be bumped whenever parseDzn changes.
+    They are written to a temporary file and renamed into place, so concurrent readers never see a partial pickle;
+    an unreadable entry is treated as a miss.
+    """
+    with open(filepath, 'rb') as f:
+        content = f.read()
+    key = hashlib.sha1(f"{PARSER_VERSION}\n".encode() + content).hexdigest()
+    if cacheDir is None:
+        return key, parseDzn(content.decode())
+    cached = os.path.join(cacheDir, key + ".pkl")
+    try:
+        with open(cached, 'rb') as f:
+            return key, pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    arrays = parseDzn(content.decode())
+    os.makedirs(cacheDir, exist_ok=True)
+    with tempfile.NamedTemporaryFile('wb', dir=cacheDir, suffix=".tmp", delete=False) as f:
+        pickle.dump(arrays, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f.name, cached)
+    return key, arrays
+
+
 class MspspInstance:
-    def __init__(self, filepath):
-        with open(filepath) as f:
-            f.readline()
-            content = f.read()
-            for c in ['\n', ' ', '\t', '[', ']']:
-                content = content.replace(c, "")
-            content = content.split(";")
-            for index, entry in enumerate(content):
-                content[index] = entry.split("=")
-            for t in content:
-                x = None
-                if t[0] in ["nActs", "nSkills", "nResources", "nPrecs", "mint", "maxt", "nUnrels"]:
-                    x = int(t[1])
-                if t[0] in ["dur", "pred", "succ", "unpred", "unsucc"]:
-                    x = t[1].split(',')
-                    for index, entry in enumerate(x):
-                        x[index] = int(entry) - (0 if t[0] == "dur" else 1)
-                if t[0] == "sreq":
-                    x = t[1][1:-2].split(",|")
-                    for index, entry in enumerate(x):
-                        x[index] = entry.split(',')
-                        for jndex, fntry in enumerate(x[index]):
-                            x[index][jndex] = int(fntry)
-                if t[0] == "mastery":
-                    x = t[1][1:-2].split(",|")
-                    for index, entry in enumerate(x):
-                        x[index] = entry.split(',')
-                        for jndex, fntry in enumerate(x[index]):
-                            if fntry == "true":
-                                x[index][jndex] = True
-                            if fntry == "false":
-                                x[index][jndex] = False
-                if t[0] in ["USEFUL_RES", "POTENTIAL_ACT"]:
-                    x = t[1][1:-1].split("},{")
-                    for index, entry in enumerate(x):
-                        if entry == "":
-                            x[index] = []
-                        else:
-                            x[index] = entry.split(',')
-                            for jndex, fntry in enumerate(x[index]):
-                                x[index][jndex] = int(fntry) - 1
-                if x:
-                    exec(f"self.{t[0]} = x")
+    def __init__(self, filepath, cacheDir=None):
+        self.contentHash, arrays = loadInstanceArrays(filepath, cacheDir)
+        for name in SCALARS:
+            if name in arrays:
+                setattr(self, name, int(arrays[name]))
+        for name in VECTORS + MATRICES:
+            if name in arrays:
+                setattr(self, name + "Array", arrays[name])
+                setattr(self, name, arrays[name].tolist())
+        for name, attribute in SETS.items():
+            if attribute + "Ptr" in arrays:
+                ptr = arrays[attribute + "Ptr"]
+                idx = arrays[attribute + "Idx"]
+                setattr(self, attribute + "Ptr", ptr)
+                setattr(self, attribute + "Idx", idx)
+                setattr(self, name, [idx[ptr[i]:ptr[i + 1]].tolist() for i in range(len(ptr) - 1)])
+        self.durArray = self.durArray.astype('int64')
+        self.sreqArray = self.sreqArray.reshape(self.nActs, self.nSkills).astype('int64')
+        self.predPtr, self.predIdx = self.adjacency(self.succ, self.pred)
+        self.succPtr, self.succIdx = self.adjacency(self.pred, self.succ)
+        self.predList = [self.predIdx[self.predPtr[act]:self.predPtr[act + 1]].tolist() for act in range(self.nActs)]
+        self.succList = [self.succIdx[self.succPtr[act]:self.succPtr[act + 1]].tolist() for act in range(self.nActs)]
+        self.predPad = np.full((self.nActs, max(map(len, self.predList), default=0)), self.nActs, dtype='int32')
+        for act, preds in enumerate(self.predList):
+            self.predPad[act, :len(preds)] = preds
+        self.succPad = np.full((self.nActs, max(map(len, self.succList), default=0)), self.nActs, dtype='int32')
+        for act, succs in enumerate(self.succList):
+            self.succPad[act, :len(succs)] = succs
+        self.topologicalOrder = self.topologicalSort()
+        self.ancestorMask = [0] * self.nActs
+        self.descendantMask = [0] * self.nActs
+        for act in self.topologicalOrder:
+            for pred in self.predList[act]:
+                self.ancestorMask[act] |= self.ancestorMask[pred] | 1 << pred
+        for act in reversed(self.topologicalOrder):
+            for succ in self.succList[act]:
+                self.descendantMask[act] |= self.descendantMask[succ] | 1 << succ
+        self.relatedMask = [ancestors | descendants for ancestors, descendants in zip(self.ancestorMask, self.descendantMask)]
+        self.slotCount = np.array([sum(req) for req in self.sreq], dtype='int32')
+        self.slotPtr = np.zeros(self.nActs + 1, dtype='int32')
+        np.cumsum(self.slotCount, out=self.slotPtr[1:])
+        self.maxSlots = int(self.slotCount.max(initial=0))
+        self.skillMask = [sum(1 << skill for skill, mastered in enumerate(row) if mastered) for row in self.mastery]
+        self.resourceMask = [
+            sum(1 << res for res in range(self.nResources) if self.mastery[res][skill])
+            for skill in range(self.nSkills)
+        ]
+        self.usefulMask = [sum(1 << res for res in resources) for resources in self.USEFUL_RES]
+        self.skillsOf = [bits(mask) for mask in self.skillMask]
+        self.slotSkill = np.repeat(np.tile(np.arange(self.nSkills), self.nActs), self.sreqArray.ravel()).astype('int32')
+        self.slotCandidates = [
+            bits(self.usefulMask[act] & self.resourceMask[skill])
+            for act, skill in zip(np.repeat(np.arange(self.nActs), self.slotCount).tolist(), self.slotSkill.tolist())
+        ]
+        self.slotCandidatePtr = np.zeros(len(self.slotCandidates) + 1, dtype='int32')
+        np.cumsum([len(candidates) for candidates in self.slotCandidates], out=self.slotCandidatePtr[1:])
+        self.slotCandidateIdx = np.array([res for candidates in self.slotCandidates for res in candidates], dtype='int32')
+        self.earliestStart = [0] * self.nActs
+        for act in self.topologicalOrder:
+            for pred in self.predList[act]:
+                self.earliestStart[act] = max(self.earliestStart[act], self.earliestStart[pred] + self.dur[pred])
+        self.criticalPathBound = max((start + dur for start, dur in zip(self.earliestStart, self.dur)), default=0)
+        self.capacityBound = self.skillCapacityBound()
+        self.lowerBound = max(self.criticalPathBound, self.capacityBound, getattr(self, 'mint', 0))
+
+    def adjacency(self, source, target):
+        order = np.argsort(source, kind='stable')
+        ptr = np.zeros(self.nActs + 1, dtype='int32')
+        np.cumsum(np.bincount(source, minlength=self.nActs), out=ptr[1:])
+        return ptr, np.array(target, dtype='int32')[order]
+
+    def topologicalSort(self):
+        indegree = [len(preds) for preds in self.predList]
+        order = [act for act in range(self.nActs) if not indegree[act]]
+        for act in order:
+            for succ in self.succList[act]:
+                indegree[succ] -= 1
+                if not indegree[succ]:
+                    order.append(succ)
+        return order
+
+    def skillCapacityBound(self, maxSubsetSkills=12):
+        """Makespan bound from the work required in a set of skills and the resources mastering any of them.
+
+        A resource contributes one skill at a time, so the total work in the set is spread over at most those
+        resources. All skill subsets are tried for up to maxSubsetSkills skills, otherwise single skills and all skills.
+        """
+        work = (self.sreqArray * self.durArray[:, None]).sum(axis=0).tolist()
+        if self.nSkills <= maxSubsetSkills:
+            subsets = range(1, 1 << self.nSkills)
+        else:
+            subsets = [1 << skill for skill in range(self.nSkills)] + [(1 << self.nSkills) - 1]
+        bound = 0
+        for subset in subsets:
+            skills = bits(subset)
+            resources = bin(reduce(or_, (self.resourceMask[skill] for skill in skills))).count("1")
+            if resources:
+                bound = max(bound, -(-sum(work[skill] for skill in skills) // resources))
+        return bound
+
+    def predecessors(self, act):
+        return self.predList[act]
+
+
+Violation = namedtuple('Violation', ['kind', 'activities', 'resources', 'skill'], defaults=[(), None])
+
+def overlappingPairs(nResources, resources, start, end):
+    users = [[] for res in range(nResources)]
+    for act, assigned in enumerate(resources):
+        for res in assigned:
+            users[res].append(act)
+    pairs = {}
+    for res, acts in enumerate(users):
+        active = []
+        for act in sorted(acts, key=lambda a: start[a]):
+            while active and active[0][0] <= start[act]:
+                heappop(active)
+            for _, other in active:
+                if start[other] < end[act]:
+                    pairs.setdefault((max(act, other), min(act, other)), []).append(res)
+            heappush(active, (end[act], act))
+    return pairs
 
 
 class MspspSolution:
@@ -60,28 +219,24 @@ class MspspSolution:
             )
 
     def isValid(self):
-        for act1 in range(self.instance.nActs):
-            for act2 in range(0, act1):
-                if len(set(self.resources[act1]) & set(self.resources[act2])) != 0 and min(self.end[act1] - self.start[act2], self.end[act2] - self.start[act1]) > 0:
-                    print("overlap")
-                    return False
-                for prec in range(self.instance.nPrecs):
-                    if (
-                        self.end[act1] > self.start[act2] and
-                        self.instance.pred[prec] == act1 and
-                        self.instance.succ[prec] == act2
-                    ) or (
-                        self.end[act2] > self.start[act1] and
-                        self.instance.pred[prec] == act2 and
-                        self.instance.succ[prec] == act1
-                    ):
-                        print("precedence")
-                        return False
-            for skill, count in enumerate(self.instance.sreq[act1]):
-                if count - len(list(filter(
-                        lambda r: self.contributedSkill[act1, r] == skill,
-                        self.resources[act1]
-                ))) > 0:
-                    print("skill")
-                    return False
-        return True
+        return not self.violations()
+
+    def violations(self):
+        result = [
+            Violation('overlap', pair, tuple(shared))
+            for pair, shared in overlappingPairs(self.instance.nResources, self.resources, self.start, self.end).items()
+        ]
+        start = np.array(self.start)
+        end = np.array(self.end)
+        pred = self.instance.predArray
+        succ = self.instance.succArray
+        for prec in np.flatnonzero((pred != succ) & (end[pred] > start[succ])):
+            result.append(Violation('precedence', (int(pred[prec]), int(succ[prec]))))
+        for act in range(self.instance.nActs):
+            contributed = [0 for skill in range(self.instance.nSkills)]
+            for res in self.resources[act]:
+                contributed[self.contributedSkill[act, res]] += 1
+            for skill, count in enumerate(self.instance.sreq[act]):
+                if count > contributed[skill]:
+                    result.append(Violation('skill', (act,), tuple(self.resources[act]), skill))
+        return result
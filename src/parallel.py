@@ -0,0 +1,37 @@
+from multiprocessing import Pool
+import random
+import numpy as np
+
+_Gene = None
+_transformedInstance = None
+
+def taskSeed():
+    return random.getrandbits(32)
+
+def seedRandom(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+def initWorker(Gene, transformedInstance):
+    global _Gene, _transformedInstance
+    _Gene = Gene
+    _transformedInstance = transformedInstance
+
+def breed(task):
+    parentsCombinations, activityMutationPropability, resourceMutationPropability, justify, seed = task
+    seedRandom(seed)
+    children = [
+        _Gene.recombine([_Gene.unpack(_transformedInstance, state) for state in parents]).mutate(
+            activityMutationPropability=activityMutationPropability,
+            resourceMutationPropability=resourceMutationPropability,
+            rescore=False
+        )
+        for parents in parentsCombinations
+    ]
+    _Gene.updateScores(children)
+    if justify:
+        _Gene.justify(children)
+    return [child.pack() for child in children]
+
+def createPool(workers, Gene, transformedInstance):
+    return Pool(workers, initializer=initWorker, initargs=(Gene, transformedInstance))
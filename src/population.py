@@ -1,4 +1,6 @@
 from gene import Gene, GraphGene
+from parallel import createPool, breed, taskSeed
+from fitnessCache import FitnessCache
 import numpy as np
 
 class Population:
@@ -11,56 +13,194 @@ class Population:
         resourceMutationPropability=0.1,
         ageBiasFactor=1,
         parentalBiasFactor=1,
-        parentCount=2
+        parentCount=2,
+        justify=False,
+        workers=None,
+        cacheSize=4096,
+        stats=None,
+        state=None
     ):
-        transformedInstance = Ge.transform(instance)
+        if justify and not Ge.supportsJustify:
+            raise ValueError(f"{Ge.__name__} does not support justification")
+        self.stats = stats
+        if stats:
+            t = stats.start()
+        self.instance = instance
+        self.transformedInstance = Ge.transform(instance)
         self.Gene = Ge
         self.size = size
-        self.population = [Ge.random(transformedInstance) for i in range(size)]
+        if state is not None:
+            self.checkState(state)
+        if state is None:
+            self.population = Ge.randomPopulation(self.transformedInstance, size)
+            if justify:
+                Ge.justify(self.population)
+        if stats:
+            stats.record('initialize', t, size)
+        self.workers = workers
+        self.pool = createPool(workers, Ge, self.transformedInstance) if workers else None
+        self.cache = FitnessCache(cacheSize) if cacheSize else None
         self.activityMutationPropability = activityMutationPropability
         self.resourceMutationPropability = resourceMutationPropability
         self.ageBiasFactor = ageBiasFactor
         self.parentalBiasFactor = parentalBiasFactor
         self.parentCount = parentCount
-        self.median = np.median([
-            x.score for x in self.population
-        ])
-        self.max = max([
-            x.score for x in self.population
-        ])
-        self.score = np.average([
-            x.score for x in self.population if x.score >= self.median
-        ])
-        self.bestRecordedMax = self.max
-        self.bestRecordedIndividual = next(filter(
-            lambda x: x.score == self.max,
-            self.population
-        ))
-        self.bestRecordedScore = self.score
-        self.stagnationPeriod = 0
+        self.justify = justify
+        if state is None:
+            self.updateStatistics()
+            self.bestRecordedMax = self.max
+            self.bestRecordedIndividual = self.population[int(np.argmax(self.scores))]
+            self.bestRecordedScore = self.score
+            self.stagnationPeriod = 0
+            self.evaluations = size
+        else:
+            self.unpackState(state)
 
 
     def age(self):
+        stats = self.stats
+        if stats:
+            t = stats.start()
         for individual in self.population:
             individual.age += 1
-        temp_sum = sum([max((self.population[i].score - self.median)*self.parentalBiasFactor, 1) for i in range(self.size)])
-        probabilities = [max((self.population[i].score - self.median)*self.parentalBiasFactor, 1)/temp_sum for i in range(self.size)]
-        parentsCombinations = [[np.random.choice(self.population, p=probabilities) for i in range(self.parentCount)] for i in range(self.size)]
-        children = [self.Gene.recombine(parents).mutate(activityMutationPropability=self.activityMutationPropability, resourceMutationPropability=self.resourceMutationPropability) for parents in parentsCombinations]
-        self.population = sorted(self.population + children, key=lambda x: x.score - x.age*self.ageBiasFactor)[-self.size:]
-        self.median = np.median([x.score for x in self.population])
-        self.max = max([x.score for x in self.population])
-        self.score = np.average([
-            x.score for x in self.population if x.score >= self.median
-        ])
+        weights = np.maximum((self.scores - self.median)*self.parentalBiasFactor, 1)
+        parentsCombinations = np.random.choice(self.size, size=(self.size, self.parentCount), p=weights/weights.sum())
+        if stats:
+            t = stats.record('selection', t)
+        if self.pool:
+            children = self.breedParallel(parentsCombinations)
+            if stats:
+                t = stats.record('breed', t, len(children))
+        else:
+            children = []
+            for parents in parentsCombinations:
+                child = self.Gene.recombine([self.population[i] for i in parents])
+                if stats:
+                    t = stats.record('recombine', t)
+                children.append(child.mutate(activityMutationPropability=self.activityMutationPropability, resourceMutationPropability=self.resourceMutationPropability, rescore=False))
+                if stats:
+                    t = stats.record('mutate', t)
+            self.evaluate(children)
+            if stats:
+                t = stats.record('evaluate', t, len(children))
+        self.evaluations += len(children)
+        candidates = self.population + children
+        scores = np.array([x.score for x in candidates])
+        fitness = scores - np.array([x.age for x in candidates])*self.ageBiasFactor
+        survivors = np.argpartition(fitness, -self.size)[-self.size:]
+        self.population = [candidates[i] for i in survivors]
+        if stats:
+            t = stats.record('survivors', t)
+        self.updateStatistics(scores[survivors])
         if self.max > self.bestRecordedMax:
             self.bestRecordedMax = self.max
-            self.bestRecordedIndividual = next(filter(
-                lambda x: x.score == self.max,
-                self.population
-            ))
+            self.bestRecordedIndividual = self.population[int(np.argmax(self.scores))]
             self.stagnationPeriod = -1
         if self.score > self.bestRecordedScore + 0.1:
             self.bestRecordedScore = self.score
             self.stagnationPeriod = -1
         self.stagnationPeriod += 1
+        if stats:
+            stats.record('bookkeeping', t)
+            stats.endGeneration(self)
+
+    def updateStatistics(self, scores=None):
+        if scores is None:
+            scores = np.array([x.score for x in self.population])
+        self.scores = scores
+        self.median = np.median(scores)
+        self.max = scores.max().item()
+        self.score = np.average(scores[scores >= self.median])
+
+    def evaluate(self, children):
+        if not self.cache:
+            self.Gene.updateScores(children)
+            if self.justify:
+                self.Gene.justify(children)
+            return
+        unscored = [child for child in children if not self.cache.lookup(child)]
+        self.Gene.updateScores(unscored)
+        if self.justify:
+            self.Gene.justify(unscored)
+        for child in unscored:
+            self.cache.store(child)
+
+    def emigrants(self, count):
+        return sorted(self.population, key=lambda x: x.score)[-count:]
+
+    def immigrate(self, individuals):
+        self.population = sorted(self.population, key=lambda x: x.score - x.age*self.ageBiasFactor)
+        for i, individual in enumerate(individuals[:self.size]):
+            individual.age = 0
+            self.population[i] = individual
+        self.updateStatistics()
+
+    def breedParallel(self, parentsCombinations):
+        packed = [individual.pack() for individual in self.population]
+        tasks = [
+            (
+                [[packed[i] for i in parents] for parents in parentsCombinations[chunk::self.workers]],
+                self.activityMutationPropability,
+                self.resourceMutationPropability,
+                self.justify,
+                taskSeed()
+            )
+            for chunk in range(self.workers)
+        ]
+        return [
+            self.Gene.unpack(self.transformedInstance, state)
+            for states in self.pool.map(breed, tasks)
+            for state in states
+        ]
+
+    def packState(self):
+        """Return the population as a dict of arrays for checkpointing.
+
+        Field i of every packed gene is stacked into gene{i}; the last row is the best recorded individual.
+        """
+        packed = [individual.pack() for individual in self.population + [self.bestRecordedIndividual]]
+        state = {f"gene{i}": np.stack(field) for i, field in enumerate(zip(*packed))}
+        state.update(self.identity())
+        state['bestRecordedMax'] = np.array(self.bestRecordedMax)
+        state['bestRecordedScore'] = np.array(self.bestRecordedScore)
+        state['stagnationPeriod'] = np.array(self.stagnationPeriod)
+        state['evaluations'] = np.array(self.evaluations)
+        return state
+
+    def identity(self):
+        """Describe the instance and gene type a packed state belongs to."""
+        return {
+            'instanceHash': np.array(self.instance.contentHash),
+            'gene': np.array(self.Gene.__name__),
+            'nActs': np.array(self.instance.nActs),
+            'nSlots': np.array(int(self.instance.slotPtr[-1])),
+            'size': np.array(self.size)
+        }
+
+    def checkState(self, state):
+        """Raise a ValueError unless state was packed by a population of the same instance, gene type and size."""
+        for key, expected in self.identity().items():
+            if key not in state:
+                raise ValueError(f"checkpoint has no {key} record")
+            if state[key].item() != expected.item():
+                raise ValueError(f"checkpoint {key} is {state[key].item()!r}, expected {expected.item()!r}")
+
+    def unpackState(self, state):
+        fields = []
+        while f"gene{len(fields)}" in state:
+            field = state[f"gene{len(fields)}"]
+            fields.append(list(field) if field.ndim > 1 else field.tolist())
+        individuals = [self.Gene.unpack(self.transformedInstance, packed) for packed in zip(*fields)]
+        self.population = individuals[:-1]
+        self.updateStatistics()
+        self.bestRecordedIndividual = individuals[-1]
+        self.bestRecordedMax = state['bestRecordedMax'].item()
+        self.bestRecordedScore = state['bestRecordedScore'].item()
+        self.stagnationPeriod = state['stagnationPeriod'].item()
+        self.evaluations = state['evaluations'].item()
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
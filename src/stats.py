@@ -0,0 +1,53 @@
+from time import perf_counter
+import json
+
+class Stats:
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.time = {}
+        self.calls = {}
+        self.generations = 0
+
+    def start(self):
+        return perf_counter()
+
+    def record(self, phase, since, calls=1):
+        now = perf_counter()
+        self.time[phase] = self.time.get(phase, 0) + now - since
+        self.calls[phase] = self.calls.get(phase, 0) + calls
+        return now
+
+    def totalTime(self):
+        return sum(self.time.values())
+
+    def snapshot(self, population):
+        total = self.totalTime()
+        result = {
+            'generation': self.generations,
+            'time': dict(self.time),
+            'calls': dict(self.calls),
+            'evaluations': population.evaluations,
+            'evaluationsPerSecond': population.evaluations / total if total else 0,
+            'max': float(population.max),
+            'median': float(population.median),
+            'average': float(population.score)
+        }
+        if population.cache:
+            result['cacheHits'] = population.cache.hits
+            result['cacheMisses'] = population.cache.misses
+            result['cacheHitRate'] = population.cache.hitRate()
+        return result
+
+    def endGeneration(self, population):
+        self.generations += 1
+        if self.stream:
+            self.stream.write(json.dumps(self.snapshot(population)) + "\n")
+
+    def show(self, population):
+        snapshot = self.snapshot(population)
+        total = self.totalTime()
+        for phase, seconds in sorted(self.time.items(), key=lambda x: -x[1]):
+            print(f"{phase}:\t{seconds:.3f}s\t{self.calls[phase]} calls\t{100*seconds/total:.1f}%")
+        print(f"evaluations/s:\t{snapshot['evaluationsPerSecond']:.1f}")
+        if population.cache:
+            print(f"cache hit rate:\t{snapshot['cacheHitRate']:.3f}")